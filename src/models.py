@@ -5,6 +5,14 @@ This module retrieves a comprehensive list of Gemini models via the
 Google Generative Language API.
 
 Revision History:
+1.0.2 2026-10-15
+  Program Purpose:
+      Retrieve a list of Gemini models.
+  Functionality:
+      Requests only the "name" field of each model (partial response) so the
+      capability metadata that is discarded anyway is never sent or parsed.
+  Keywords:
+      retrieve_gemini_models, requests, GEMINI_API_KEY, fields, partial_response
 1.0.1 2025-06-23
   Program Purpose:
       Retrieve a list of Gemini models.
@@ -36,7 +44,8 @@ def retrieve_gemini_models():
     1. Attempts to retrieve the 'GEMINI_API_KEY' from environment variables
        if no API key is provided. 
     2. If the API key is absent, an empty list is returned after logging an error. 
-    3. Constructs the API endpoint URL using the API key. 
+    3. Constructs the API endpoint URL using the API key, limiting the
+       response to the model names with the "fields" system parameter. 
     4. Makes an HTTP GET request to the Gemini API with a timeout. 
     5. Checks for HTTP errors and handles exceptions, printing errors to
        sys.stderr. 
@@ -61,15 +70,15 @@ def retrieve_gemini_models():
     else:
         # Other logic: Construct API endpoint
         base_url = "https://generativelanguage.googleapis.com/v1beta/models"
-        url = f"{base_url}?key={api_key}"
+        # Partial response: only the model names are returned
+        url = f"{base_url}?key={api_key}&fields=models.name"
 
         # Core logic: API call and response processing
         try:
             response = requests.get(url, timeout=10)
             response.raise_for_status()  # Raise an exception for HTTP errors
 
-            data = response.json()
-            models = [model["name"] for model in data.get("models", [])]
+            models = [model["name"] for model in response.json().get("models", [])]
         except requests.exceptions.RequestException as error:
             print(
                 f"An error occurred during the API call: {error}",
@@ -15,90 +15,343 @@ Update History:
     - Moved the reset of `json_fragment` outside the conditional block to streamline logic.
     - Simplified the conditional branching when appending to `json_buffer` for
       clearer JSON extraction.
+2.3.1, 2026-10-15: Replaced the byte-by-byte streaming loop in generate_response.
+    - iter_content() without a chunk size yielded one byte per iteration; the stream is
+      now read in 64 KB blocks with iter_lines.
+    - Each "data: " line is parsed with a single json.loads call; the manual UTF-8
+      reassembly, regex scan and JSON retry loop are removed.
+2.3.2, 2026-10-15: Added the `_SSE_CHUNK_SIZE` module constant (64 KB) for the stream read size.
+2.3.3, 2026-10-15: generate_response collects the "data: " lines of an SSE event in a list
+    and joins them once when the event ends, so a payload split over several data lines
+    is parsed with a single json.loads call.
+2.3.4, 2026-10-15: Added parse_sse_events, an SSE event framer over a bytearray buffer.
+    - Replaces iter_lines, which re-concatenated the pending tail with every chunk and
+      reported a spurious blank line when "\r\n" was split across two reads.
+    - generate_response calls json.loads exactly once per complete event.
+2.3.5, 2026-10-15: SSE events are parsed with orjson when it is installed, falling back to
+    the standard json module otherwise.
+2.3.6, 2026-10-15: generate_response posts through a module-level requests.Session so the
+    HTTPS connection is kept alive between turns instead of a TLS handshake per request.
+2.3.7, 2026-10-15: parse_sse_events accepts "data:" lines without the optional space and
+    bare "data" fields, as defined by the event stream format.
+2.3.8, 2026-10-15: get_model_response collects the streamed text parts in a list and joins
+    them once, instead of growing response_text with += per part.
+2.3.9, 2026-10-15: The bye/goodbye pattern checked in main is compiled once at module scope.
+2.3.10, 2026-10-15: The streaming request explicitly advertises compressed encodings
+    (gzip, deflate, and br when brotli is installed); the repetitive JSON events
+    compress well and are decompressed before parse_sse_events sees them.
+2.3.11, 2026-10-15: Added the `_USE_SSE` switch and parse_json_array_stream.
+    - With `_USE_SSE = False` the request uses "?alt=json" and the streamed JSON array is
+      decoded element by element, with no line scanning for SSE framing.
+    - Split UTF-8 sequences are handled by an incremental decoder, and decoding is only
+      attempted when the received text ends like a complete element.
+2.3.12, 2026-10-15: Added serialize_history, which caches the serialized conversation history
+    and encodes only the turns appended since the previous request. generate_response
+    sends the prebuilt bytes with `data=` instead of re-serializing the whole history
+    through `json=` on every turn.
+2.3.13, 2026-10-15: parse_sse_events splits all complete lines of the buffer with one
+    bytes.splitlines call instead of a Python-level find loop per line.
+2.3.14, 2026-10-15: parse_sse_events only copies a chunk into its bytearray buffer while a
+    partial line is pending; chunks that hold whole lines are split directly.
+2.3.15, 2026-10-15: get_model_response looks up "candidates", "content" and "parts" once per
+    level and skips chunks without them instead of iterating over default empty containers.
+2.3.16, 2026-10-15: get_model_response writes the text parts with sys.stdout.write and
+    flushes once per streamed chunk rather than calling print(..., flush=True) per part.
+2.3.17, 2026-10-15: parse_sse_events also cuts complete lines at a bare "\r", so streams that
+    end lines with CR only are no longer buffered until the end. A "\r" at the end of a chunk
+    is held back until the next chunk shows whether a "\n" follows.
+2.3.18, 2026-10-15: The serialized history cache is owned by the caller instead of a module
+    global. main() keeps one per conversation and passes it down to serialize_history.
+    - Each cached turn is stored with a copy of the turn; a turn edited after it was
+      serialized no longer matches its copy and is encoded again with all later turns.
+    - generationConfig is dumped with allow_nan=False like the history, as `json=` did.
+2.3.19, 2026-10-15: The history is serialized with the default ensure_ascii=True, as `json=`
+    did, so lone surrogates from surrogateescape input are sent as \\u escapes instead of
+    failing to encode. The request body is built inside the try block, and a history that
+    cannot be serialized (e.g. NaN) yields the request_error dict instead of ending the chat.
+2.3.20, 2026-10-15: SSE events with an empty payload (a bare "data" or "data:" line) and
+    events that are not JSON, such as a "[DONE]" sentinel, are skipped by
+    decode_sse_events instead of raising a JSON decode error out of the chat loop.
 Keywords:
     GEMINI_MODEL, GEMINI_API_KEY, GEMINI_API_URL, generate_response, conversation_history.
 """
 
 import os
 import re
+import sys
+import copy
 import json
+import codecs
 import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import DEFAULT_ACCEPT_ENCODING
 
+# orjson is optional; it parses the bytes of each event two to three times faster
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
 # Constants for the Gemini API (the model identifier is "gemma")
 GEMINI_MODEL = "models/gemma-3n-e4b-it"
 GEMINI_API_KEY = "GEMINI_API_KEY"
 GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta"
 
-def generate_response(conversation_history: dict, generation_config: dict = None):
+# Read size for the streaming response (tune per deployment).
+# With chunked transfer encoding this is an upper bound per read, so smaller
+# HTTP chunks are still delivered as soon as they arrive.
+_SSE_CHUNK_SIZE = 64 * 1024
+
+# Stream format: server-sent events (True) or one JSON array ("?alt=json")
+# whose elements are decoded as they arrive (False)
+_USE_SSE = True
+
+# Array punctuation and whitespace between the elements of "?alt=json"
+_JSON_ARRAY_GAP_RE = re.compile(r"[\s\[\],]*")
+_JSON_DECODER = json.JSONDecoder()
+
+# Shared session so the TCP/TLS connection is reused across conversation turns
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+# Ends the chat when the model says good bye
+_GOODBYE_RE = re.compile(r'\b(?:bye|goodbye)\b', re.IGNORECASE)
+
+
+def serialize_history(conversation_history, history_cache):
     """
-    Sends a streaming request to the Google AI Gemini API, handling UTF-8 decoding manually
-    from iter_content to yield JSON-decoded response chunks.
+    Serializes the conversation history as a JSON array, reusing the encoding of the
+    turns that are unchanged since the previous call.
+    history_cache belongs to the caller and holds a (copy of the turn, encoded turn)
+    pair per turn. A cached turn that no longer equals its copy, e.g. because parts
+    were added to it, is encoded again together with every turn after it.
+
+    Args:
+        conversation_history (list): The conversation history.
+        history_cache (list): The cache of this conversation; updated in place.
+
+    Returns:
+        bytes: The UTF-8 encoded JSON array.
+    """
+
+    # Keep the cached turns up to the first one that was edited or replaced
+    unchanged_turns = 0
+    for (cached_turn, _), turn in zip(history_cache, conversation_history):
+        if cached_turn != turn:
+            break
+        unchanged_turns += 1
+    del history_cache[unchanged_turns:]
+
+    for turn in conversation_history[unchanged_turns:]:
+        history_cache.append((copy.deepcopy(turn), json.dumps(
+            turn, separators=(",", ":"), allow_nan=False
+        ).encode("ascii")))
+
+    return b"".join((b"[", b",".join(encoded for _, encoded in history_cache), b"]"))
+
+
+def _dispatch_sse_lines(lines, data_lines):
+    """
+    Applies complete SSE lines to the pending event and yields each event closed
+    by a blank line.
+
+    Args:
+        lines (list): Complete lines without their line breaks.
+        data_lines (list): "data:" values of the pending event; updated in place.
+
+    Yields:
+        bytes: The joined "data:" lines of one event.
+    """
+
+    for line in lines:
+        if line.startswith(b"data:"):
+            # A single space after the colon is optional and not part of the data
+            data_value = line[5:]
+            data_lines.append(data_value[1:] if data_value[:1] == b" " else data_value)
+        elif line == b"data":
+            data_lines.append(b"")
+        elif not line and data_lines:
+            # A blank line closes the event
+            yield b"\n".join(data_lines)
+            data_lines.clear()
+
+    # End of _dispatch_sse_lines function
+
+
+def parse_sse_events(byte_chunks):
+    """
+    Splits a raw SSE byte stream into events and yields the data of each event.
+    Events may straddle chunk boundaries; incomplete lines stay buffered until
+    the rest of the line arrives. Comment lines and fields other than "data"
+    are ignored, following the WHATWG event stream format.
+
+    Args:
+        byte_chunks (iterable): Raw byte chunks read from the response.
+
+    Yields:
+        bytes: The joined "data:" lines of one event.
+    """
+
+    stream_buffer = bytearray()
+    data_lines = []
+
+    for chunk in byte_chunks:
+        # Copy into the buffer only while a partial line is pending; a chunk
+        # that starts on a line boundary is split without being copied
+        is_buffered = bool(stream_buffer)
+        if is_buffered:
+            stream_buffer += chunk
+            chunk = stream_buffer
+
+        # Everything up to the last "\n" or "\r" is complete lines; the tail may be
+        # a partial line and stays buffered. A "\r" at the very end also stays
+        # buffered, since the "\n" of a "\r\n" pair may arrive in the next chunk
+        search_end = len(chunk) - 1 if chunk.endswith(b"\r") else len(chunk)
+        block_end = max(chunk.rfind(b"\n", 0, search_end), chunk.rfind(b"\r", 0, search_end)) + 1
+
+        # splitlines handles "\n", "\r\n" and "\r" in a single C-level pass
+        yield from _dispatch_sse_lines(chunk[:block_end].splitlines(), data_lines)
+
+        if is_buffered:
+            # Drop the consumed lines in place
+            del stream_buffer[:block_end]
+        else:
+            stream_buffer += chunk[block_end:]
+
+    # A "\r" held back at the end of the stream is a complete line break
+    if stream_buffer.endswith(b"\r"):
+        yield from _dispatch_sse_lines(stream_buffer.splitlines(), data_lines)
+
+    # End of parse_sse_events function
+
+
+def decode_sse_events(byte_chunks):
+    """
+    Decodes the JSON payload of each server-sent event framed by parse_sse_events.
+    Empty payloads and payloads that are not JSON (e.g. a "[DONE]" sentinel) carry
+    no response chunk and are skipped.
+
+    Args:
+        byte_chunks (iterable): Raw byte chunks read from the response.
+
+    Yields:
+        dict or list: The JSON-decoded payload of one event.
+    """
+
+    for event_data in parse_sse_events(byte_chunks):
+        if not event_data:
+            continue
+        try:
+            parsed_data = _json_loads(event_data)
+        except ValueError:
+            # Both json and orjson raise a ValueError subclass on invalid input
+            continue
+        yield parsed_data
+
+    # End of decode_sse_events function
+
+
+def parse_json_array_stream(byte_chunks):
+    """
+    Incrementally decodes the JSON array returned by "?alt=json" and yields each
+    element as soon as it is complete, without waiting for the closing bracket.
+
+    Args:
+        byte_chunks (iterable): Raw byte chunks read from the response.
+
+    Yields:
+        dict: One element of the response array.
+    """
+
+    utf8_decoder = codecs.getincrementaldecoder("utf-8")()
+    text_fragments = []
+
+    for chunk in byte_chunks:
+        # Partial UTF-8 sequences are kept by the decoder until the next chunk
+        text = utf8_decoder.decode(chunk)
+        if not text:
+            continue
+        text_fragments.append(text)
+
+        # An element can only be complete when the text ends like one
+        if not text.rstrip().endswith(("}", ",", "]")):
+            continue
+
+        json_buffer = "".join(text_fragments)
+        position = 0
+        while True:
+            position = _JSON_ARRAY_GAP_RE.match(json_buffer, position).end()
+            if position == len(json_buffer):
+                break
+            try:
+                element, position = _JSON_DECODER.raw_decode(json_buffer, position)
+            except json.JSONDecodeError:
+                # The element is incomplete; wait for more data
+                break
+            yield element
+
+        text_fragments = [json_buffer[position:]] if position < len(json_buffer) else []
+
+    # End of parse_json_array_stream function
+
+
+def generate_response(conversation_history: dict, generation_config: dict = None,
+                      history_cache: list = None):
+    """
+    Sends a streaming request to the Google AI Gemini API and yields the JSON-decoded
+    payload of each server-sent event decoded by decode_sse_events, or of each array
+    element decoded by parse_json_array_stream when _USE_SSE is False.
 
     Args:
         conversation_history (dict): The conversation history.
         generation_config (dict, optional): The configuration dict for content generation.
+        history_cache (list, optional): The serialized history cache of this conversation
+            (see serialize_history). Without it, the whole history is serialized.
 
     Yields:
         dict: A JSON-decoded chunk from the API response.
     """
 
-    request_body = {
-        "contents": conversation_history,
-        "generationConfig": generation_config
-    }
+    if history_cache is None:
+        history_cache = []
 
-    byte_stream_buffer = b""
-    json_fragment = ""
-    json_buffer = ""
+    stream_format = "alt=sse" if _USE_SSE else "alt=json"
 
     # Other logic: API key retrieval
     api_key = os.getenv(GEMINI_API_KEY)
 
     try:
-        response = requests.post(
-            f"{GEMINI_API_URL}/{GEMINI_MODEL}:" "streamGenerateContent?alt=sse",
+        # Only new or edited turns are serialized; the rest comes from the history cache.
+        # ValueError (e.g. NaN in the history) is reported below like a request error
+        request_body = b"".join((
+            b'{"contents":', serialize_history(conversation_history, history_cache),
+            b',"generationConfig":', json.dumps(generation_config, allow_nan=False).encode("ascii"),
+            b"}"
+        ))
+
+        response = _SESSION.post(
+            f"{GEMINI_API_URL}/{GEMINI_MODEL}:streamGenerateContent?{stream_format}",
             headers= {
                 "Content-Type": "application/json",
+                # Only encodings urllib3 can decode ("br" needs brotli installed);
+                # iter_content yields the decompressed bytes
+                "Accept-Encoding": DEFAULT_ACCEPT_ENCODING,
                 "x-goog-api-key": api_key
             },
-            json=request_body,
+            data=request_body,
             stream=True,
             timeout=(5, 10)
         )
         response.raise_for_status()
 
-        for chunk in response.iter_content():
-
-            if not chunk:
-                continue
-
-            byte_stream_buffer += chunk
-
-            try:
-                # Attempt to decode the accumulated bytes as UTF-8 and append to json_fragment
-                json_fragment += byte_stream_buffer.decode("utf-8")
-            except UnicodeDecodeError:
-                # Incomplete UTF-8 sequence; wait for the next chunk
-                continue
-
-            byte_stream_buffer = b""
-
-            if json_buffer:
-                json_buffer += json_fragment
-            elif match := re.search(r"^[ \t\r\n]*data: (.+)$", json_fragment):
-                json_buffer = match.group(1)
-            else:
-                continue
-
-            json_fragment = ""
+        byte_chunks = response.iter_content(_SSE_CHUNK_SIZE)
+        if _USE_SSE:
+            parsed_stream = decode_sse_events(byte_chunks)
+        else:
+            parsed_stream = parse_json_array_stream(byte_chunks)
 
-            try:
-                parsed_data = json.loads(json_buffer)
-                json_buffer = ""
-            except json.JSONDecodeError:
-                # The JSON data is incomplete; wait for more data
-                continue
+        for parsed_data in parsed_stream:
 
             if isinstance(parsed_data, list):
                 for item in parsed_data:
@@ -110,7 +363,8 @@ def generate_response(conversation_history: dict, generation_config: dict = None
         requests.exceptions.HTTPError,
         requests.exceptions.ConnectionError,
         requests.exceptions.RequestException,
-        requests.exceptions.Timeout) as request_error:
+        requests.exceptions.Timeout,
+        ValueError) as request_error:
         yield {"error": "request_error", "message": str(request_error)}
 
     # End of generate_response function
@@ -136,25 +390,37 @@ def get_user_input(role):
     return user_text
 
 
-def get_model_response(conversation_history):
+def get_model_response(conversation_history, history_cache=None):
     """
     Args:
         conversation_history (dict): Recorded conversation history including user prompts.
+        history_cache (list, optional): The serialized history cache of this conversation.
 
     return:
         str: The model's response message.
     """
 
-    response_text = ""
-    for chunk in generate_response(conversation_history):
-        for candidate in chunk.get("candidates", []):
-            for part in candidate.get("content", {}).get("parts", []):
+    response_parts = []
+    append_part = response_parts.append
+    write_output = sys.stdout.write
+    for chunk in generate_response(conversation_history, history_cache=history_cache):
+        candidates = chunk.get("candidates")
+        if not candidates:
+            continue
+        for candidate in candidates:
+            content = candidate.get("content")
+            parts = content.get("parts") if content else None
+            if not parts:
+                continue
+            for part in parts:
                 text_chunk = part.get("text", "")
-                if "{" in text_chunk and response_text == "":
-                    print()
-                print(text_chunk, end="", flush=True)
-                response_text += part["text"]
-    return response_text
+                if "{" in text_chunk and not response_parts:
+                    write_output("\n")
+                write_output(text_chunk)
+                append_part(text_chunk)
+        # One flush per streamed chunk instead of one per part
+        sys.stdout.flush()
+    return "".join(response_parts)
 
 
 def main():
@@ -163,6 +429,8 @@ def main():
     It collects user input, records conversation history, and displays streaming responses.
     """
     conversation_history = []
+    # Encoded turns reused by serialize_history on the following requests
+    history_cache = []
 
     while True:
         user_record = {"role": "user", "parts": []}
@@ -175,9 +443,9 @@ def main():
 
         model_record = {"role": "model", "parts": []}
         print("model: ", end="", flush=True)
-        model_text = get_model_response(conversation_history)
+        model_text = get_model_response(conversation_history, history_cache)
         model_record["parts"].append({"text": model_text})
-        if re.search(r'\b(?:bye|goodbye)\b', model_text, flags=re.IGNORECASE):
+        if _GOODBYE_RE.search(model_text):
             break
 
     # End of main function
@@ -40,6 +40,63 @@ Update History:
       retrieval during content generation.
     - Configured `tool_config` with `function_calling_config` mode set to `AUTO`
       for automatic tool invocation.
+2.6.1, 2026-10-15: Replaced the byte-by-byte streaming loop in generate_response.
+    - iter_content() without a chunk size yielded one byte per iteration; the SSE stream is
+      now read with iter_lines in 8 KB blocks.
+    - Each "data: " line is decoded and parsed once; byte_stream_buffer, json_fragment and
+      the regex are removed.
+2.6.2, 2026-10-15: The bye/goodbye pattern is compiled once at module scope, and the
+    trailing "}" / newline checks in get_model_response use str.endswith instead of regex.
+2.6.3, 2026-10-15: get_model_response collects the streamed text parts in a list and joins
+    them once instead of growing response_text with += per part.
+2.6.4, 2026-10-15: Attachment type checks in extract_attachments.
+    - The allowed MIME types are module-level frozensets instead of lists rebuilt per file.
+    - MIME types are guessed from the lowercase extension through an lru_cache.
+    - `assert ... / except AssertionError` is replaced with plain checks, which also
+      keeps the validation active under `python -O`.
+2.6.5, 2026-10-15: Binary attachments are base64 encoded in 57 KB blocks into a preallocated
+    buffer instead of reading the whole file and encoding it in one step.
+2.6.6, 2026-10-15: custom_parse_list splits enum lists with the csv module instead of a
+    character-by-character Python loop.
+2.6.7, 2026-10-15: extract_response_schema measures the indentation of each schema line once
+    and passes (indent, stripped, raw) tuples to parse_properties, parse_array_block and
+    parse_bullet_item, which no longer recompute len(line) - len(line.lstrip(" ")).
+2.6.8, 2026-10-15: generate_response decodes pure-ASCII SSE lines with the ASCII codec after a
+    bytes.isascii() check and only falls back to UTF-8 for lines with non-ASCII bytes.
+2.6.9, 2026-10-15: get_model_response scans the user's text parts once for both the response
+    schema and the attachments, and adds each attachment as its own part (previously the
+    list returned by extract_attachments was appended as a single nested part).
+2.6.10, 2026-10-15: generate_response uses `yield from` for list-typed chunks.
+2.6.11, 2026-10-15: SSE lines are parsed with orjson when it is installed (json otherwise),
+    straight from the raw bytes after the "data: " prefix; the per-line decode is removed.
+2.6.12, 2026-10-15: Text attachments are read once in binary mode and decoded once with
+    errors="replace", instead of a strict text read followed by a second read on
+    UnicodeDecodeError. JSON attachments are parsed directly from the bytes.
+2.6.13, 2026-10-15: extract_response_schema returns early when the text contains no "::::".
+2.6.14, 2026-10-15: get_model_response finds the attachment references and the "::::" schema
+    marker of each text part in a single finditer scan over one combined pattern.
+    - load_attachments and build_response_schema take the scan results directly;
+      extract_attachments and extract_response_schema remain as wrappers around them.
+2.6.15, 2026-10-15: load_attachments checks each file with a single os.stat call instead of
+    os.path.isfile, and passes its size to _process_binary, which no longer calls os.fstat.
+2.6.16, 2026-10-15: extract_attachments returns early when the text contains no "[[", and
+    load_attachments computes each lowercase extension once and tells _read_text_file
+    whether the file is JSON instead of lowercasing the path again.
+2.6.17, 2026-10-15: The streaming URL and the googleSearch tools / tool_config are built once
+    at module scope, and requests go through a shared requests.Session so the TCP/TLS
+    connection is reused across conversation turns.
+2.6.18, 2026-10-15: The "}" and newline checks at the end of get_model_response are merged
+    into a single endswith("\n") check with the same output.
+2.6.19, 2026-10-15: custom_parse_list splits enum lists with the regex tokenizer used by
+    test_respsml.py instead of csv.reader. A single csv quote character could not follow the
+    per-token quoting of the original loop (e.g. ["a, b", 'c, d'] or [don't, x]); the
+    tokenizer gives the same lists as the original character loop.
+2.6.20, 2026-10-15: Removed extract_attachments and extract_response_schema. Since 2.6.14
+    get_model_response calls scan_prompt_markup, load_attachments and build_response_schema
+    directly, and the wrappers kept a second copy of the "::::" marker search.
+2.6.21, 2026-10-15: scan_prompt_markup returns early when the text contains neither "[[" nor
+    "::::", so plain prompts skip the combined regex. (The "[[" check added in 2.6.16 sat in
+    extract_attachments, which was no longer called.)
 
 Keywords:
     GEMINI_MODEL, GEMINI_API_KEY, GEMINI_API_URL, generate_response, conversation_history,
@@ -49,22 +106,79 @@ Keywords:
 import os
 import re
 import sys
+import stat
 import json
+import functools
 import mimetypes
 import base64
 import requests
 
 import prompt_toolkit
 
+# orjson is optional; it parses the bytes of each event two to three times faster
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 # Constants for the Gemini API (the model identifier is "gemma")
 GEMINI_MODEL = "models/gemini-2.0-flash"
 GEMINI_API_KEY = "GEMINI_API_KEY"
 GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta"
 
+# Request constants shared by every call to generate_response
+_STREAM_URL = f"{GEMINI_API_URL}/{GEMINI_MODEL}:streamGenerateContent?alt=sse"
+_TOOLS = [{"googleSearch": {}}]
+_TOOL_CONFIG = {
+    "function_calling_config": {
+      "mode": "AUTO"
+    }
+}
+
+# Shared session so the TCP/TLS connection is reused across conversation turns
+_SESSION = requests.Session()
+
+# Ends the chat when the user or the model says good bye
+_BYE_RE = re.compile(r"\b(?:bye|goodbye)\b", re.IGNORECASE)
+
+# [[filename]] attachment references and the "::::" line that starts a schema block.
+# The marker line is delimited by the same line breaks as str.splitlines() uses.
+_LINE_BREAKS = r"\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+_PROMPT_MARKUP_RE = re.compile(
+    rf"\[\[(?P<attachment>.+?)\]\]"
+    rf"|(?:^|(?<=[{_LINE_BREAKS}]))"
+    rf"[^\S{_LINE_BREAKS}]*::::[^\S{_LINE_BREAKS}]*"
+    rf"(?=[{_LINE_BREAKS}]|\Z)")
+
+# Attachment formats supported by the Gemini API (see API documentation for details)
+_ALLOWED_BINARY_MIMES = frozenset({
+    "image/png", "image/jpeg", "image/webp", "image/heic", "image/heif",
+    "audio/wav", "audio/mp3", "audio/aiff", "audio/aac", "audio/ogg", "audio/flac"
+})
+_ALLOWED_TEXT_MIMES = frozenset({
+    "application/pdf",
+    "application/x-javascript", "text/javascript",
+    "application/x-python", "text/x-python",
+    "text/html", "text/css", "text/md", "text/csv", "text/xml", "text/rtf",
+    "text/plain"
+})
+
+# Read size for base64 encoding attachments; a multiple of 3 bytes, so no padding
+# is emitted between blocks
+_BASE64_BLOCK_SIZE = 57 * 1024
+
+# One list item of custom_parse_list: backslash escapes, quoted runs (which may contain commas;
+# an unclosed quote runs to the end) and any other characters, up to the separating comma
+_LIST_ITEM_RE = re.compile(
+    r"""((?:\\.?|"(?:\\.?|[^"\\])*"?|'(?:\\.?|[^'\\])*'?|[^,"'\\])*)(,?)""", re.DOTALL)
+# A backslash escape; the backslash is dropped and the escaped character kept
+_ESCAPE_RE = re.compile(r"\\(.?)", re.DOTALL)
+
 def generate_response(conversation_history: dict, generation_config: dict = None):
     """
-    Sends a streaming request to the Google AI Gemini API, handling UTF-8 decoding manually
-    from iter_content to yield JSON-decoded response chunks.
+    Sends a streaming request to the Google AI Gemini API and yields the JSON-decoded
+    chunk carried by each "data: " line of the SSE response.
 
     Args:
         conversation_history (dict): The conversation history.
@@ -80,25 +194,15 @@ def generate_response(conversation_history: dict, generation_config: dict = None
     }
 
     if not request_body["generationConfig"]:
-        request_body["tools"] = []
-        request_body["tools"].append({ "googleSearch": {} })
-
-        request_body["tool_config"] = {
-            "function_calling_config": {
-              "mode": "AUTO"
-            }
-        }
-
-    byte_stream_buffer = b""
-    json_fragment = ""
-    json_buffer = ""
+        request_body["tools"] = _TOOLS
+        request_body["tool_config"] = _TOOL_CONFIG
 
     # Other logic: API key retrieval
     api_key = os.getenv(GEMINI_API_KEY)
 
     try:
-        response = requests.post(
-            f"{GEMINI_API_URL}/{GEMINI_MODEL}:" "streamGenerateContent?alt=sse",
+        response = _SESSION.post(
+            _STREAM_URL,
             headers= {
                 "Content-Type": "application/json",
                 "x-goog-api-key": api_key
@@ -109,41 +213,17 @@ def generate_response(conversation_history: dict, generation_config: dict = None
         )
         response.raise_for_status()
 
-        for chunk in response.iter_content():
+        # SSE framing puts one JSON object on each "data: " line
+        for raw_line in response.iter_lines(chunk_size=8192, delimiter=b"\n"):
 
-            if not chunk:
+            if not raw_line.startswith(b"data: "):
                 continue
 
-            byte_stream_buffer += chunk
-
-            try:
-                # Attempt to decode the accumulated bytes as UTF-8 and append to json_fragment
-                json_fragment += byte_stream_buffer.decode("utf-8")
-            except UnicodeDecodeError:
-                # Incomplete UTF-8 sequence; wait for the next chunk
-                continue
-
-            byte_stream_buffer = b""
-
-            if json_buffer:
-                json_buffer += json_fragment
-            elif match := re.search(r"^[ \t\r\n]*data: (.+)$", json_fragment):
-                json_buffer = match.group(1)
-            else:
-                continue
-
-            json_fragment = ""
-
-            try:
-                parsed_data = json.loads(json_buffer)
-                json_buffer = ""
-            except json.JSONDecodeError:
-                # The JSON data is incomplete; wait for more data
-                continue
+            # Both parsers accept the UTF-8 bytes directly; no decode step is needed
+            parsed_data = _json_loads(raw_line[6:])
 
             if isinstance(parsed_data, list):
-                for item in parsed_data:
-                    yield item
+                yield from parsed_data
             else:
                 yield parsed_data
 
@@ -190,86 +270,132 @@ def get_model_response(conversation_history):
     user_prompt = conversation_history[-1]
     generation_config = None
     if user_prompt["role"] == "user":
+        # One scan of each text part finds both the response schema and the attachments
         user_attachments = []
         for part in user_prompt["parts"]:
-            if "text" in part:
-                if response_schema := extract_response_schema(part["text"]):
-                    generation_config = {
-                        "responseMimeType": "application/json",
-                        "responseSchema": response_schema
-                    }
-                    break
-        for part in user_prompt["parts"]:
-            if "text" in part:
-                result = extract_attachments(part["text"])
-                user_attachments.append(result)
-        user_prompt["parts"] += user_attachments
-
-    response_text = ""
+            text = part.get("text")
+            if text is None:
+                continue
+            filenames, schema_offset = scan_prompt_markup(text)
+            if generation_config is None and schema_offset is not None:
+                generation_config = {
+                    "responseMimeType": "application/json",
+                    "responseSchema": build_response_schema(text[schema_offset:].splitlines())
+                }
+            user_attachments.extend(load_attachments(filenames))
+        user_prompt["parts"].extend(user_attachments)
+
+    response_parts = []
     for chunk in generate_response(conversation_history, generation_config):
         for candidate in chunk.get("candidates", []):
             for part in candidate.get("content", {}).get("parts", []):
                 text_chunk = part.get("text", "")
-                if "{" in text_chunk and response_text == "":
+                if "{" in text_chunk and not response_parts:
                     print()
                 print(text_chunk, end="", flush=True)
-                response_text += part["text"]
+                response_parts.append(text_chunk)
+    response_text = "".join(response_parts)
 
-    if re.search(r'}$', response_text):
-        print()
-    elif not re.search(r'\n$', response_text):
+    # A JSON reply ends with "}", so this also ends the line after structured output
+    if not response_text.endswith("\n"):
         print()
 
     return response_text.rstrip()
 
 
-def extract_attachments(raw_text):
+@functools.lru_cache(maxsize=256)
+def _guess_mime_type(extension):
     """
-    Extracts attachments from the user's raw input text and generates content objects
-    (in dictionary format) for the Gemini API.
-    If attachments are present, images or audio files are read in binary mode and
-    encoded as a base64 string.
+    Guesses the MIME type for a lowercase file extension (e.g. ".png").
+    Results are cached, since attachments share a small set of extensions.
+    """
+    mime_type, _ = mimetypes.guess_type(f"attachment{extension}")
+    return mime_type
+
+
+def scan_prompt_markup(raw_text):
+    """
+    Scans the user's raw input text once for [[filename]] attachment references and
+    the "::::" line that starts a response schema block.
+
+    Args:
+        raw_text (str): The raw input text from the user.
+
+    Returns:
+        tuple: The list of attachment filenames, and the offset just past the first
+            "::::" line (None if the text has no schema block).
+    """
+    # Most prompts have neither attachments nor a schema block; skip the regex for them
+    if "[[" not in raw_text and "::::" not in raw_text:
+        return [], None
+    filenames = []
+    schema_offset = None
+    for match in _PROMPT_MARKUP_RE.finditer(raw_text):
+        filename = match.group("attachment")
+        if filename is not None:
+            filenames.append(filename)
+        elif schema_offset is None:
+            schema_offset = match.end()
+    return filenames, schema_offset
+
+
+def load_attachments(filenames):
+    """
+    Reads the attachment files and generates content objects (in dictionary format)
+    for the Gemini API.
+    Images or audio files are read in binary mode and encoded as a base64 string.
 
     Args:
-        raw_text (str): The raw input text from the user (which may include attachment notations).
+        filenames (list): Filenames taken from the [[filename]] notations.
 
     Returns:
         list: A list of dictionaries containing attachment information.
     """
     # Helper function to process binary files (e.g., images or audio) in a unified manner.
-    def _process_binary(filename):
+    # The file is encoded block by block into a buffer sized for the whole base64 text,
+    # so the raw file is never held in memory at once.
+    def _process_binary(filename, file_size):
         with open(filename, "rb") as binary_file:
-            data = binary_file.read()
-        encoded = base64.b64encode(data).decode("utf-8")
-        return encoded
+            encoded = bytearray((file_size + 2) // 3 * 4)
+            position = 0
+            while block := binary_file.read(_BASE64_BLOCK_SIZE):
+                encoded_block = base64.b64encode(block)
+                encoded[position:position + len(encoded_block)] = encoded_block
+                position += len(encoded_block)
+        del encoded[position:]
+        return encoded.decode("ascii")
 
     # Helper function to read the contents of a text file.
+    # The file is read once as bytes and decoded once; invalid UTF-8 is replaced.
     # If the file is JSON, it will be formatted as a single line.
-    def _read_text_file(filename):
-        try:
-            with open(filename, "r", encoding="utf-8") as text_file:
-                content = text_file.read()
-        except UnicodeDecodeError:
-            with open(filename, "rb") as text_file:
-                content = text_file.read().decode("utf-8", errors="replace")
-        if filename.lower().endswith(".json"):
+    def _read_text_file(filename, is_json):
+        with open(filename, "rb") as text_file:
+            raw_content = text_file.read()
+        if is_json:
             try:
-                parsed = json.loads(content)
-                content = json.dumps(parsed, separators=(',', ':'))
-            except json.JSONDecodeError:
+                return json.dumps(_json_loads(raw_content), separators=(',', ':'))
+            except ValueError:
+                # Not valid JSON (or not valid UTF-8); send it as plain text
                 pass
+        content = raw_content.decode("utf-8", errors="replace")
+        if "\r" in content:
+            # Same newline translation as reading in text mode
+            content = content.replace("\r\n", "\n").replace("\r", "\n")
         return content
 
-    block_pattern = r"\[\[(.+?)\]\]"
-    filenames = re.findall(block_pattern, raw_text)
     extracted_attachments = []
     for filename in filenames:
         filename = os.path.expanduser(filename)
-        if not os.path.isfile(filename):
+        try:
+            file_stat = os.stat(filename)
+        except OSError:
+            file_stat = None
+        if file_stat is None or not stat.S_ISREG(file_stat.st_mode):
             # Skip if the specified file is not found.
             print(f"file not found: {filename}", file=sys.stderr)
             continue
-        mime_type, _ = mimetypes.guess_type(filename)
+        extension = os.path.splitext(filename)[1].lower()
+        mime_type = _guess_mime_type(extension)
         if mime_type is None:
             continue
         if "json" in mime_type:
@@ -282,60 +408,43 @@ def extract_attachments(raw_text):
             # Gemini API does not support audio/mpeg, process as audio/mp3 instead.
             mime_type = "audio/mp3"
         if "image/" in mime_type or "audio/" in mime_type:
-            # Supported formats for the Gemini API (see API documentation for details)
-            allowed_mime_types = [
-                "image/png", "image/jpeg", "image/webp", "image/heic", "image/heif",
-                "audio/wav", "audio/mp3", "audio/aiff", "audio/aac", "audio/ogg", "audio/flac"
-            ]
-            try:
-                assert mime_type in allowed_mime_types
-                content_data = _process_binary(filename)
-                extracted_attachments.append({
-                    "inline_data": {
-                        "data": content_data,
-                        "mime_type": mime_type
-                    }
-                })
-            except AssertionError:
-                print(f"unknown mime type: {mime_type} / {allowed_mime_types}", file=sys.stderr)
+            if mime_type not in _ALLOWED_BINARY_MIMES:
+                print(f"unknown mime type: {mime_type} / {sorted(_ALLOWED_BINARY_MIMES)}",
+                      file=sys.stderr)
                 continue
+            content_data = _process_binary(filename, file_stat.st_size)
+            extracted_attachments.append({
+                "inline_data": {
+                    "data": content_data,
+                    "mime_type": mime_type
+                }
+            })
         else:
-            try:
-                allowed_text_types = [
-                    "application/pdf",
-                    "application/x-javascript", "text/javascript",
-                    "application/x-python", "text/x-python",
-                    "text/html", "text/css", "text/md", "text/csv", "text/xml", "text/rtf",
-                    "text/plain"
-                ]
-                assert mime_type in allowed_text_types
-                content_text = _read_text_file(filename)
-                extracted_attachments.append({
-                    "inline_data": {
-                        "mime_type": mime_type,
-                        "data": content_text
-                    }
-                })
-            except AssertionError:
-                print(f"unknown mime type: {mime_type} / {allowed_text_types}", file=sys.stderr)
+            if mime_type not in _ALLOWED_TEXT_MIMES:
+                print(f"unknown mime type: {mime_type} / {sorted(_ALLOWED_TEXT_MIMES)}",
+                      file=sys.stderr)
                 continue
+            content_text = _read_text_file(filename, extension == ".json")
+            extracted_attachments.append({
+                "inline_data": {
+                    "mime_type": mime_type,
+                    "data": content_text
+                }
+            })
     return extracted_attachments
 
 
-def extract_response_schema(raw_text):
+def build_response_schema(lines):
     """
-    Extracts the "::::" block from the raw_text and converts it into a JSON Schema dictionary.
+    Converts the lines following the "::::" marker into a JSON Schema dictionary.
     """
-    lines = raw_text.splitlines()
-    schema_start = None
-    for i, line in enumerate(lines):
-        if line.strip() == "::::":
-            schema_start = i + 1
-            break
-    if schema_start is None:
-        return None
-    schema_lines = [line.rstrip() for line in lines[schema_start:] if line.strip() != ""]
-    props, _ = parse_properties(schema_lines, 0, 0)
+    schema_lines = [line.rstrip() for line in lines if line.strip() != ""]
+    # Measure each line's indentation once; the parsers below only read these tuples
+    indented_lines = []
+    for line in schema_lines:
+        stripped = line.lstrip(" ")
+        indented_lines.append((len(line) - len(stripped), stripped, line))
+    props, _ = parse_properties(indented_lines, 0, 0)
     return {"type": "object", "properties": props}
 
 def merge_object_schemas(schema_list):
@@ -360,34 +469,16 @@ def custom_parse_list(text):
     if not inner:
         return []
     tokens = []
-    current_token = ""
-    in_quote = False
-    quote_char = ""
-    escape = False
-    for char in inner:
-        if escape:
-            current_token += char
-            escape = False
-            continue
-        if char == "\\":
-            escape = True
-            continue
-        if in_quote:
-            current_token += char
-            if char == quote_char:
-                in_quote = False
+    for token, separator in _LIST_ITEM_RE.findall(inner):
+        if "\\" in token:
+            token = _ESCAPE_RE.sub(r"\1", token)
+        if separator:
+            tokens.append(token.strip())
         else:
-            if char in ['"', "'"]:
-                in_quote = True
-                quote_char = char
-                current_token += char
-            elif char == ",":
-                tokens.append(current_token.strip())
-                current_token = ""
-            else:
-                current_token += char
-    if current_token:
-        tokens.append(current_token.strip())
+            # The last item; it is dropped when the list ends with a comma
+            if token:
+                tokens.append(token.strip())
+            break
     result = []
     for token in tokens:
         is_token = token.startswith('"') and token.endswith('"')
@@ -402,6 +493,7 @@ def parse_properties(lines, base_indent, start_index):
     Parses properties at the specified indentation level.
 
     Properties are defined either as "key: [description]" or as "key:" followed by a child block.
+    Each entry of lines is an (indent, stripped, raw) tuple built by build_response_schema.
 
     Returns:
       A tuple containing the properties dictionary and the next line index to process.
@@ -409,17 +501,16 @@ def parse_properties(lines, base_indent, start_index):
     properties = {}
     line_index = start_index
     while line_index < len(lines):
-        line = lines[line_index]
-        indent = len(line) - len(line.lstrip(" "))
+        indent, stripped, _ = lines[line_index]
         if indent < base_indent:
             break
         # Do not treat bullet lines as properties
-        if line.lstrip(" ").startswith("-"):
+        if stripped.startswith("-"):
             break
-        if ":" not in line.lstrip(" "):
+        if ":" not in stripped:
             line_index += 1
             continue
-        key, remainder = line.lstrip(" ").split(":", 1)
+        key, remainder = stripped.split(":", 1)
         key = key.strip()
         is_key = key.startswith('"') and key.endswith('"')
         is_key = is_key or (key.startswith("'") and key.endswith("'"))
@@ -439,9 +530,8 @@ def parse_properties(lines, base_indent, start_index):
             definition["description"] = remainder
         else:
             if line_index + 1 < len(lines):
-                next_line = lines[line_index + 1]
-                next_indent = len(next_line) - len(next_line.lstrip(" "))
-                if next_line.lstrip().startswith("-") and next_indent > indent:
+                next_indent, next_stripped, _ = lines[line_index + 1]
+                if next_stripped.lstrip().startswith("-") and next_indent > indent:
                     definition, new_index = parse_array_block(lines, line_index + 1, indent)
                     line_index = new_index - 1
                 else:
@@ -461,13 +551,12 @@ def parse_array_block(lines, start_index, _parent_indent):
     """
     if start_index >= len(lines):
         return {"type": "array", "items": {"type": "string"}}, start_index
-    bullet_indent = len(lines[start_index]) - len(lines[start_index].lstrip(" "))
+    bullet_indent = lines[start_index][0]
     items = []
     idx = start_index
     while idx < len(lines):
-        current_line = lines[idx]
-        current_indent = len(current_line) - len(current_line.lstrip(" "))
-        if current_indent < bullet_indent or not current_line.lstrip().startswith("-"):
+        current_indent, current_stripped, _ = lines[idx]
+        if current_indent < bullet_indent or not current_stripped.lstrip().startswith("-"):
             break
         item, idx = parse_bullet_item(lines, idx, bullet_indent)
         items.append(item)
@@ -487,31 +576,26 @@ def parse_bullet_item(lines, idx, bullet_indent):
     Returns:
       A tuple containing the element's JSON Schema (or string) and the next line index to process.
     """
-    line = lines[idx]
-    content = line.lstrip()[1:].lstrip()
-    bullet_lines = [" " * bullet_indent + content]
+    content = lines[idx][1].lstrip()[1:].lstrip()
+    bullet_lines = [(bullet_indent, content, " " * bullet_indent + content)]
     idx += 1
     while idx < len(lines):
-        next_line = lines[idx]
-        next_indent = len(next_line) - len(next_line.lstrip(" "))
-        if next_indent > bullet_indent:
-            bullet_lines.append(next_line)
+        if lines[idx][0] > bullet_indent:
+            bullet_lines.append(lines[idx])
             idx += 1
         else:
             break
-    if any(":" in line_item for line_item in bullet_lines):
-        norm_lines = []
-        min_indent = None
-        for line_item in bullet_lines:
-            current_indent = len(line_item.rstrip("\n")) - len(line_item.rstrip("\n").lstrip(" "))
-            if min_indent is None or current_indent < min_indent:
-                min_indent = current_indent
-        for line_item in bullet_lines:
-            norm_lines.append(line_item[min_indent:] if min_indent is not None else line_item)
+    if any(":" in stripped for _, stripped, _ in bullet_lines):
+        # Shift the item's lines left so that its first line starts at column 0
+        min_indent = min(indent for indent, _, _ in bullet_lines)
+        norm_lines = [
+            (indent - min_indent, stripped, raw[min_indent:])
+            for indent, stripped, raw in bullet_lines
+        ]
         props, _ = parse_properties(norm_lines, 0, 0)
         value = {"type": "object", "properties": props}
     else:
-        value = " ".join(line_item.strip() for line_item in bullet_lines)
+        value = " ".join(stripped.strip() for _, stripped, _ in bullet_lines)
     return value, idx
 
 
@@ -574,9 +658,9 @@ def main():
         print("model: ", end="", flush=True)
         model_text = get_model_response(conversation_history)
         model_record["parts"].append({"text": model_text})
-        if re.search(r'\b(?:bye|goodbye)\b', model_text, flags=re.IGNORECASE):
+        if _BYE_RE.search(model_text):
             break
-        if re.search(r'\b(?:bye|goodbye)\b', user_text, flags=re.IGNORECASE):
+        if _BYE_RE.search(user_text):
             break
     print()
 
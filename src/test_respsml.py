@@ -9,29 +9,90 @@ Update History:
 4. 2025-06-24: Added flexible parsing to support mixed quoting.
 5. 2025-06-24: Merged bullet items for object array definitions to ensure example1 and example2
    yield equivalent schema.
+6. 2026-10-15: custom_parse_list splits the list with a precompiled regex tokenizer instead of a
+   character-by-character loop. Quoting and backslash escapes behave as before.
+7. 2026-10-15: extract_response_schema measures the indentation of each schema line once and passes
+   (indent, stripped, raw) tuples to parse_properties, parse_array_block and parse_bullet_item,
+   which no longer recompute len(line) - len(line.lstrip(" ")).
+8. 2026-10-15: Enum lists that cannot be JSON (e.g. [fine, cloud, rain]) go straight to
+   custom_parse_list instead of raising and catching JSONDecodeError first.
+9. 2026-10-15: extract_response_schema finds the "::::" line with one regex search and collects the
+   non-blank, right-stripped schema lines with one findall instead of splitlines() plus filtering.
+10. 2026-10-15: parse_array_block merges its object items with _merge_trusted, which skips the
+   per-schema type checks of merge_object_schemas for dicts built by parse_bullet_item.
+11. 2026-10-15: custom_parse_list removes surrounding quotes with one precompiled regex match per
+   token instead of four startswith/endswith calls.
+12. 2026-10-15: parse_bullet_item shifts an object item left by the bullet's own indentation, which
+   is always the smallest one in the item, instead of scanning the item's lines for the minimum.
+13. 2026-10-15: custom_input reuses one PromptSession and its key bindings across calls, and reads
+   with input() when stdin is not a terminal.
+14. 2026-10-15: parse_array_block tracks whether every bullet item is an object while collecting
+   them, instead of re-scanning the items with all(isinstance(...)) afterwards.
+15. 2026-10-15: main writes each schema to stdout with json.dump instead of building the whole
+   string with json.dumps first.
+16. 2026-10-15: Schema line tuples are (indent, stripped, is_bullet, bullet_content); the bullet test
+   and the text after "-" are computed once per line instead of in each parser. The unused raw
+   line is no longer kept.
+17. 2026-10-15: parse_properties splits "key: value" lines with str.partition, which also tells
+   whether the line has a colon, instead of a membership test followed by split(":", 1).
+18. 2026-10-15: Surrounding quotes on property keys and enum tokens are detected by comparing the
+   first and last characters, replacing the startswith/endswith pairs and the _QUOTED_RE match.
 """
 
+import re
 import sys
 import json
+import functools
 import prompt_toolkit
 
+# One list item of custom_parse_list: backslash escapes, quoted runs (which may contain commas;
+# an unclosed quote runs to the end) and any other characters, up to the separating comma
+_LIST_ITEM_RE = re.compile(
+    r"""((?:\\.?|"(?:\\.?|[^"\\])*"?|'(?:\\.?|[^'\\])*'?|[^,"'\\])*)(,?)""", re.DOTALL)
+# A backslash escape; the backslash is dropped and the escaped character kept
+_ESCAPE_RE = re.compile(r"\\(.?)", re.DOTALL)
+# Lines are delimited by the same line breaks as str.splitlines() uses
+_LINE_BREAKS = r"\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+# The "::::" line that starts a schema block
+_SCHEMA_MARKER_RE = re.compile(
+    rf"(?:^|(?<=[{_LINE_BREAKS}]))"
+    rf"[^\S{_LINE_BREAKS}]*::::[^\S{_LINE_BREAKS}]*"
+    rf"(?=[{_LINE_BREAKS}]|\Z)")
+# A non-blank line without its trailing whitespace
+_SCHEMA_LINE_RE = re.compile(rf"(?<=[{_LINE_BREAKS}])[^{_LINE_BREAKS}]*\S")
+# Quote characters that may surround a property key or an enum token
+_QUOTE_CHARS = ('"', "'")
+# Characters and words a JSON array can be made of; a list that does not match is sure to
+# fail json.loads
+_JSON_LIKE_LIST_RE = re.compile(
+    r'\[(?:\s|"(?:\\.|[^"\\])*"|[-+.\deE\[\]{},:]|true|false|null|NaN|Infinity)*\]')
+
 def extract_response_schema(text):
     """
     Extracts the "::::" block from the text and converts it into a JSON Schema dictionary.
     """
-    lines = text.splitlines()
-    schema_start = None
-    for i, line in enumerate(lines):
-        if line.strip() == "::::":
-            schema_start = i + 1
-            break
-    if schema_start is None:
+    marker = _SCHEMA_MARKER_RE.search(text) if "::::" in text else None
+    if marker is None:
         print("Error: Schema block not found", file=sys.stderr)
         return None
-    schema_lines = [line.rstrip() for line in lines[schema_start:] if line.strip() != ""]
-    props, _ = parse_properties(schema_lines, 0, 0)
+    # Measure each line's indentation once; the parsers below only read these tuples
+    indented_lines = []
+    for line in _SCHEMA_LINE_RE.findall(text, marker.end()):
+        stripped = line.lstrip(" ")
+        indented_lines.append(_schema_line(len(line) - len(stripped), stripped))
+    props, _ = parse_properties(indented_lines, 0, 0)
     return {"type": "object", "properties": props}
 
+def _schema_line(indent, stripped):
+    """
+    Builds the (indent, stripped, is_bullet, bullet_content) tuple the parsers read for one
+    schema line. A bullet "-" may follow any whitespace; bullet_content is the text after it.
+    """
+    bullet_text = stripped.lstrip()
+    if bullet_text.startswith("-"):
+        return (indent, stripped, True, bullet_text[1:].lstrip())
+    return (indent, stripped, False, None)
+
 def merge_object_schemas(schema_list):
     """
     Merge process: Merge multiple object schemas (dicts) into one.
@@ -43,6 +104,16 @@ def merge_object_schemas(schema_list):
             merged["properties"].update(schema["properties"])
     return merged
 
+def _merge_trusted(schema_list):
+    """
+    Same as merge_object_schemas, for object schemas built by parse_bullet_item,
+    which always have "type": "object" and "properties".
+    """
+    properties = {}
+    for schema in schema_list:
+        properties.update(schema["properties"])
+    return {"type": "object", "properties": properties}
+
 def custom_parse_list(text):
     """
     Custom parser: Splits the string inside square brackets [ ... ] by commas,
@@ -54,39 +125,20 @@ def custom_parse_list(text):
     if not inner:
         return []
     tokens = []
-    current_token = ""
-    in_quote = False
-    quote_char = ""
-    escape = False
-    for char in inner:
-        if escape:
-            current_token += char
-            escape = False
-            continue
-        if char == "\\":
-            escape = True
-            continue
-        if in_quote:
-            current_token += char
-            if char == quote_char:
-                in_quote = False
+    for token, separator in _LIST_ITEM_RE.findall(inner):
+        if "\\" in token:
+            token = _ESCAPE_RE.sub(r"\1", token)
+        if separator:
+            tokens.append(token.strip())
         else:
-            if char in ['"', "'"]:
-                in_quote = True
-                quote_char = char
-                current_token += char
-            elif char == ",":
-                tokens.append(current_token.strip())
-                current_token = ""
-            else:
-                current_token += char
-    if current_token:
-        tokens.append(current_token.strip())
+            # The last item; it is dropped when the list ends with a comma
+            if token:
+                tokens.append(token.strip())
+            break
     result = []
     for token in tokens:
-        is_token = token.startswith('"') and token.endswith('"')
-        is_token = is_token or (token.startswith("'") and token.endswith("'"))
-        if is_token:
+        first = token[:1]
+        if first == token[-1:] and first in _QUOTE_CHARS:
             token = token[1:-1]
         result.append(token)
     return result
@@ -96,6 +148,8 @@ def parse_properties(lines, base_indent, start_index):
     Parses properties at the specified indentation level.
 
     Properties are defined either as "key: [description]" or as "key:" followed by a child block.
+    Each entry of lines is an (indent, stripped, is_bullet, bullet_content) tuple built by
+    _schema_line.
 
     Returns:
       A tuple containing the properties dictionary and the next line index to process.
@@ -103,28 +157,30 @@ def parse_properties(lines, base_indent, start_index):
     properties = {}
     line_index = start_index
     while line_index < len(lines):
-        line = lines[line_index]
-        indent = len(line) - len(line.lstrip(" "))
+        indent, stripped, _, _ = lines[line_index]
         if indent < base_indent:
             break
         # Do not treat bullet lines as properties
-        if line.lstrip(" ").startswith("-"):
+        if stripped.startswith("-"):
             break
-        if ":" not in line.lstrip(" "):
+        key, colon, remainder = stripped.partition(":")
+        if not colon:
             line_index += 1
             continue
-        key, remainder = line.lstrip(" ").split(":", 1)
         key = key.strip()
-        is_key = key.startswith('"') and key.endswith('"')
-        is_key = is_key or (key.startswith("'") and key.endswith("'"))
-        if is_key:
+        first = key[:1]
+        if first == key[-1:] and first in _QUOTE_CHARS:
             key = key[1:-1]
         remainder = remainder.strip()
         definition = {}
         if remainder.startswith("[") and remainder.endswith("]"):
-            try:
-                enum_values = json.loads(remainder)
-            except json.JSONDecodeError:
+            enum_values = None
+            if _JSON_LIKE_LIST_RE.fullmatch(remainder):
+                try:
+                    enum_values = json.loads(remainder)
+                except json.JSONDecodeError:
+                    pass
+            if enum_values is None:
                 enum_values = custom_parse_list(remainder)
             definition["type"] = "string"
             definition["enum"] = enum_values
@@ -133,9 +189,8 @@ def parse_properties(lines, base_indent, start_index):
             definition["description"] = remainder
         else:
             if line_index + 1 < len(lines):
-                next_line = lines[line_index + 1]
-                next_indent = len(next_line) - len(next_line.lstrip(" "))
-                if next_line.lstrip().startswith("-") and next_indent > indent:
+                next_indent, _, next_is_bullet, _ = lines[line_index + 1]
+                if next_is_bullet and next_indent > indent:
                     definition, new_index = parse_array_block(lines, line_index + 1, indent)
                     line_index = new_index - 1
                 else:
@@ -155,19 +210,23 @@ def parse_array_block(lines, start_index, _parent_indent):
     """
     if start_index >= len(lines):
         return {"type": "array", "items": {"type": "string"}}, start_index
-    bullet_indent = len(lines[start_index]) - len(lines[start_index].lstrip(" "))
+    bullet_indent = lines[start_index][0]
     items = []
+    all_objects = True
     idx = start_index
     while idx < len(lines):
-        current_line = lines[idx]
-        current_indent = len(current_line) - len(current_line.lstrip(" "))
-        if current_indent < bullet_indent or not current_line.lstrip().startswith("-"):
+        current_indent, _, current_is_bullet, _ = lines[idx]
+        if current_indent < bullet_indent or not current_is_bullet:
             break
         item, idx = parse_bullet_item(lines, idx, bullet_indent)
-        items.append(item)
+        # Only object items are kept; one string item makes it an array of strings
+        if all_objects and isinstance(item, dict):
+            items.append(item)
+        else:
+            all_objects = False
     # If all bullet items are objects, merge them into a single schema
-    if items and all(isinstance(item, dict) for item in items):
-        merged = merge_object_schemas(items)
+    if items and all_objects:
+        merged = _merge_trusted(items)
         return {"type": "array", "items": merged}, idx
 
     return {"type": "array", "items": {"type": "string"}}, idx
@@ -181,53 +240,56 @@ def parse_bullet_item(lines, idx, bullet_indent):
     Returns:
       A tuple containing the element's JSON Schema (or string) and the next line index to process.
     """
-    line = lines[idx]
-    content = line.lstrip()[1:].lstrip()
-    bullet_lines = [" " * bullet_indent + content]
-    idx += 1
-    while idx < len(lines):
-        next_line = lines[idx]
-        next_indent = len(next_line) - len(next_line.lstrip(" "))
-        if next_indent > bullet_indent:
-            bullet_lines.append(next_line)
-            idx += 1
-        else:
-            break
-    if any(":" in line_item for line_item in bullet_lines):
-        norm_lines = []
-        min_indent = None
-        for line_item in bullet_lines:
-            current_indent = len(line_item.rstrip("\n")) - len(line_item.rstrip("\n").lstrip(" "))
-            if min_indent is None or current_indent < min_indent:
-                min_indent = current_indent
-        for line_item in bullet_lines:
-            norm_lines.append(line_item[min_indent:] if min_indent is not None else line_item)
+    content = lines[idx][3]
+    end = idx + 1
+    while end < len(lines) and lines[end][0] > bullet_indent:
+        end += 1
+    continuation_lines = lines[idx + 1:end]
+    if ":" in content or any(":" in stripped for _, stripped, _, _ in continuation_lines):
+        # The continuation lines are indented deeper than the bullet, so shifting the item
+        # left by bullet_indent puts its first line at column 0
+        norm_lines = [_schema_line(0, content)]
+        norm_lines.extend(
+            (current_indent - bullet_indent, stripped, is_bullet, bullet_content)
+            for current_indent, stripped, is_bullet, bullet_content in continuation_lines
+        )
         props, _ = parse_properties(norm_lines, 0, 0)
         value = {"type": "object", "properties": props}
     else:
-        value = " ".join(line_item.strip() for line_item in bullet_lines)
-    return value, idx
+        words = [content.strip()]
+        words.extend(stripped.strip() for _, stripped, _, _ in continuation_lines)
+        value = " ".join(words)
+    return value, end
 
 
-def custom_input(prompt_message=None):
+@functools.lru_cache(maxsize=1)
+def _prompt_session():
     """
-    Provides a custom input prompt that supports multi-line mode.
-
-    Returns:
-      The text entered by the user.
+    Builds the PromptSession used by custom_input on its first call; later calls reuse it.
     """
     def binding_handler_alt_enter(event):
         event.app.current_buffer.insert_text("\n")
     def binding_handler_ctrl_l(event):
         event.app.invalidate()
-    def get_prompt_handler():
-        return prompt_message if prompt_message is not None else ""
     key_bindings = prompt_toolkit.key_binding.KeyBindings()
     key_bindings.add("escape", "enter")(binding_handler_alt_enter)
     key_bindings.add("c-l")(binding_handler_ctrl_l)
+    return prompt_toolkit.PromptSession(key_bindings=key_bindings)
+
+def custom_input(prompt_message=None):
+    """
+    Provides a custom input prompt that supports multi-line mode.
+    When stdin is not a terminal (e.g. piped input), a plain input() is used instead.
+
+    Returns:
+      The text entered by the user.
+    """
+    def get_prompt_handler():
+        return prompt_message if prompt_message is not None else ""
     try:
-        session = prompt_toolkit.PromptSession(key_bindings=key_bindings)
-        input_text = session.prompt(get_prompt_handler, multiline=False)
+        if not sys.stdin.isatty():
+            return input(get_prompt_handler())
+        input_text = _prompt_session().prompt(get_prompt_handler, multiline=False)
     except KeyboardInterrupt:
         input_text = ""
     return input_text
@@ -251,7 +313,8 @@ def main():
     print("----")
     print(text)
     print("----")
-    print(json.dumps(schema, ensure_ascii=False, indent=2))
+    json.dump(schema, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
     print("----")
     print()
 
@@ -266,7 +329,8 @@ def main():
     print("----")
     print(text)
     print("----")
-    print(json.dumps(schema, ensure_ascii=False, indent=2))
+    json.dump(schema, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
     print("----")
     print()
 
@@ -281,7 +345,8 @@ def main():
     print("----")
     print(text)
     print("----")
-    print(json.dumps(schema, ensure_ascii=False, indent=2))
+    json.dump(schema, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
     print("----")
     print()
 
@@ -293,7 +358,8 @@ def main():
     print("----")
     print(text)
     print("----")
-    print(json.dumps(schema, ensure_ascii=False, indent=2))
+    json.dump(schema, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
     print("----")
     print()
 
@@ -302,7 +368,8 @@ def main():
     schema = extract_response_schema(text)
     if schema is None:
         sys.exit(1)
-    print(json.dumps(schema, ensure_ascii=False, indent=2))
+    json.dump(schema, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
 
 if __name__ == '__main__':
     main()